@@ -5,19 +5,30 @@ Export canonical tables from Supabase PostGIS to GeoJSON files.
 This script connects to the Supabase PostgreSQL database and exports
 canonical geospatial tables as versioned GeoJSON files for Tippecanoe processing.
 
+Rows are streamed from a server-side cursor in batches. With --pipeline, a
+fetch thread, a process pool of feature encoders and an ordered writer run
+concurrently so DB transfer, serialization and disk writes overlap; the
+output file is byte-for-byte identical to the sequential path.
+
 Usage:
     python export_canonical.py --layer parcels
     python export_canonical.py --layer all --jurisdiction harris
+    python export_canonical.py --layer parcels --pipeline --workers 4 --queue-depth 8
 """
 
 import argparse
 import json
+import multiprocessing
 import os
+import queue
 import sys
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from decimal import Decimal
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 
 
 class DecimalEncoder(json.JSONEncoder):
@@ -28,7 +39,11 @@ class DecimalEncoder(json.JSONEncoder):
         return super().default(obj)
 
 import psycopg2
-from psycopg2.extras import RealDictCursor
+
+# Rows fetched per round trip from the server-side cursor
+DEFAULT_BATCH_SIZE = 5000
+# Fetched batches buffered ahead of the encoders in pipelined mode
+DEFAULT_QUEUE_DEPTH = 4
 
 # Layer configuration mapping canonical tables to export parameters
 # IMPORTANT: These must match actual database column names exactly
@@ -149,11 +164,146 @@ def get_db_connection() -> psycopg2.extensions.connection:
     return psycopg2.connect(db_url)
 
 
+def encode_feature_batch(rows: Sequence[Tuple[Any, ...]], properties: List[str]) -> bytes:
+    """
+    Encode fetched rows as comma-separated GeoJSON Feature objects.
+    
+    Module-level so it can be shipped to worker processes. Each row is
+    (geometry_json_text, *properties) in LAYER_CONFIG order.
+    """
+    features = []
+    for row in rows:
+        feature = {
+            "type": "Feature",
+            "geometry": json.loads(row[0]) if row[0] is not None else None,
+            "properties": dict(zip(properties, row[1:])),
+        }
+        features.append(json.dumps(feature, cls=DecimalEncoder))
+    return ", ".join(features).encode("utf-8")
+
+
+def _encode_batches_sequential(
+    cur: psycopg2.extensions.cursor,
+    properties: List[str],
+    batch_size: int,
+) -> Iterator[Tuple[bytes, int]]:
+    """Fetch and encode batches one after another on the calling thread."""
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            return
+        yield encode_feature_batch(rows, properties), len(rows)
+
+
+_FETCH_DONE = object()
+
+
+def _encode_batches_pipelined(
+    cur: psycopg2.extensions.cursor,
+    properties: List[str],
+    batch_size: int,
+    workers: Optional[int],
+    queue_depth: int,
+) -> Iterator[Tuple[bytes, int]]:
+    """
+    Fetch, encode and yield batches concurrently, preserving cursor order.
+    
+    A fetch thread fills a bounded queue from the cursor, a process pool
+    encodes batches, and results are yielded in submission order so the
+    caller can write them straight to disk.
+    """
+    fetched: "queue.Queue[Any]" = queue.Queue(maxsize=queue_depth)
+    stop = threading.Event()
+    
+    def put(item: Any) -> None:
+        while not stop.is_set():
+            try:
+                fetched.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+    
+    def fetch() -> None:
+        try:
+            while not stop.is_set():
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                put(rows)
+        except Exception as e:
+            put(e)
+        finally:
+            put(_FETCH_DONE)
+    
+    fetcher = threading.Thread(target=fetch, name="export-fetch", daemon=True)
+    fetcher.start()
+    
+    try:
+        # spawn, not fork: the parent holds a live libpq connection and a
+        # running fetch thread that forked children must not inherit
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as pool:
+            pending: deque = deque()
+            while True:
+                item = fetched.get()
+                if item is _FETCH_DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                pending.append((pool.submit(encode_feature_batch, item, properties), len(item)))
+                # Bound in-flight batches so memory stays flat on huge layers
+                while len(pending) > queue_depth:
+                    future, count = pending.popleft()
+                    yield future.result(), count
+            while pending:
+                future, count = pending.popleft()
+                yield future.result(), count
+    finally:
+        stop.set()
+        fetcher.join()
+
+
+def _write_feature_collection(
+    output_path: Path,
+    layer_name: str,
+    chunks: Iterator[Tuple[bytes, int]],
+    build_metadata: Callable[[int], Dict[str, Any]],
+) -> int:
+    """
+    Stream encoded feature chunks into a GeoJSON FeatureCollection file.
+    
+    Produces the same bytes as json.dump() of the equivalent dict. Returns
+    the number of features written.
+    """
+    record_count = 0
+    with open(output_path, "wb") as f:
+        f.write(b'{"type": "FeatureCollection", "name": ')
+        f.write(json.dumps(layer_name).encode("utf-8"))
+        f.write(b', "features": [')
+        for chunk, count in chunks:
+            if not count:
+                continue
+            if record_count:
+                f.write(b", ")
+            f.write(chunk)
+            record_count += count
+        f.write(b'], "metadata": ')
+        f.write(json.dumps(build_metadata(record_count), cls=DecimalEncoder).encode("utf-8"))
+        f.write(b"}")
+    return record_count
+
+
 def export_layer_to_geojson(
     conn: psycopg2.extensions.connection,
     layer_name: str,
     jurisdiction: Optional[str] = None,
     output_dir: Path = Path("export"),
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    pipeline: bool = False,
+    workers: Optional[int] = None,
+    queue_depth: int = DEFAULT_QUEUE_DEPTH,
 ) -> Dict[str, Any]:
     """
     Export a canonical table to GeoJSON format.
@@ -163,6 +313,10 @@ def export_layer_to_geojson(
         layer_name: Name of the layer to export
         jurisdiction: Optional jurisdiction filter (e.g., 'harris', 'travis')
         output_dir: Directory to write output files
+        batch_size: Rows fetched from the cursor per batch
+        pipeline: Overlap fetch, encoding and writing across threads/processes
+        workers: Encoder processes in pipelined mode (default: CPU count)
+        queue_depth: Batches buffered between pipeline stages
         
     Returns:
         Dictionary with export statistics
@@ -180,14 +334,15 @@ def export_layer_to_geojson(
     prop_select = ", ".join([f'"{p}"' for p in properties])
     
     # Build query with optional jurisdiction filter
-    where_clause = ""
     params: List[Any] = []
     
+    # Geometry is fetched as text and parsed by the encoders, keeping JSON
+    # decoding off the fetch thread in pipelined mode.
     # Handle layers without jurisdiction column (e.g., wetlands)
     if jurisdiction and jurisdiction_col:
         query = f"""
             SELECT 
-                ST_AsGeoJSON(ST_Transform({geom_col}, 4326))::json AS geometry,
+                ST_AsGeoJSON(ST_Transform({geom_col}, 4326)) AS geometry,
                 {prop_select}
             FROM {table}
             WHERE LOWER("{jurisdiction_col}") = LOWER(%s)
@@ -197,39 +352,14 @@ def export_layer_to_geojson(
     else:
         query = f"""
             SELECT 
-                ST_AsGeoJSON(ST_Transform({geom_col}, 4326))::json AS geometry,
+                ST_AsGeoJSON(ST_Transform({geom_col}, 4326)) AS geometry,
                 {prop_select}
             FROM {table}
             WHERE {geom_col} IS NOT NULL
         """
     
-    print(f"Exporting {layer_name} from {table}...")
-    
-    with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute(query, params if (jurisdiction and jurisdiction_col) else None)
-        rows = cur.fetchall()
-    
-    # Build GeoJSON FeatureCollection
-    features = []
-    for row in rows:
-        feature = {
-            "type": "Feature",
-            "geometry": row["geometry"],
-            "properties": {k: row[k] for k in properties if k in row},
-        }
-        features.append(feature)
-    
-    geojson = {
-        "type": "FeatureCollection",
-        "name": layer_name,
-        "features": features,
-        "metadata": {
-            "exported_at": datetime.utcnow().isoformat(),
-            "jurisdiction": jurisdiction or "all",
-            "record_count": len(features),
-            "source_table": table,
-        },
-    }
+    mode = f"pipelined, {workers or os.cpu_count()} workers" if pipeline else "sequential"
+    print(f"Exporting {layer_name} from {table} ({mode})...")
     
     # Create output directory
     output_dir.mkdir(parents=True, exist_ok=True)
@@ -240,17 +370,39 @@ def export_layer_to_geojson(
     filename = f"{layer_name}{jurisdiction_suffix}_{version}.geojson"
     output_path = output_dir / filename
     
-    # Write GeoJSON file
-    with open(output_path, "w") as f:
-        json.dump(geojson, f, cls=DecimalEncoder)
+    # Server-side cursor so rows arrive in batches instead of one fetchall()
+    with conn.cursor(name=f"export_{layer_name}") as cur:
+        cur.itersize = batch_size
+        cur.execute(query, params if (jurisdiction and jurisdiction_col) else None)
+        
+        if pipeline:
+            chunks = _encode_batches_pipelined(cur, properties, batch_size, workers, queue_depth)
+        else:
+            chunks = _encode_batches_sequential(cur, properties, batch_size)
+        
+        try:
+            record_count = _write_feature_collection(
+                output_path,
+                layer_name,
+                chunks,
+                lambda count: {
+                    "exported_at": datetime.utcnow().isoformat(),
+                    "jurisdiction": jurisdiction or "all",
+                    "record_count": count,
+                    "source_table": table,
+                },
+            )
+        finally:
+            # Stop the fetch thread before the cursor is closed
+            chunks.close()
     
     file_size = output_path.stat().st_size
-    print(f"  ✓ Exported {len(features)} features to {output_path} ({file_size:,} bytes)")
+    print(f"  ✓ Exported {record_count} features to {output_path} ({file_size:,} bytes)")
     
     return {
         "layer": layer_name,
         "jurisdiction": jurisdiction,
-        "record_count": len(features),
+        "record_count": record_count,
         "file_path": str(output_path),
         "file_size": file_size,
         "version": version,
@@ -260,15 +412,18 @@ def export_layer_to_geojson(
 def export_all_layers(
     jurisdiction: Optional[str] = None,
     output_dir: Path = Path("export"),
+    **export_options: Any,
 ) -> List[Dict[str, Any]]:
-    """Export all configured layers."""
+    """Export all configured layers, passing export_options to each layer export."""
     conn = get_db_connection()
     results = []
     
     try:
         for layer_name in LAYER_CONFIG.keys():
             try:
-                result = export_layer_to_geojson(conn, layer_name, jurisdiction, output_dir)
+                result = export_layer_to_geojson(
+                    conn, layer_name, jurisdiction, output_dir, **export_options
+                )
                 results.append(result)
             except Exception as e:
                 print(f"  ✗ Failed to export {layer_name}: {e}")
@@ -302,21 +457,52 @@ def main():
         default=Path("export"),
         help="Output directory for GeoJSON files",
     )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="Rows fetched from the database per batch",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Overlap DB fetch, feature encoding and disk writes",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Encoder processes in pipelined mode (default: CPU count)",
+    )
+    parser.add_argument(
+        "--queue-depth",
+        type=int,
+        default=DEFAULT_QUEUE_DEPTH,
+        help="Batches buffered between pipeline stages",
+    )
     
     args = parser.parse_args()
+    export_options = {
+        "batch_size": args.batch_size,
+        "pipeline": args.pipeline,
+        "workers": args.workers,
+        "queue_depth": args.queue_depth,
+    }
     
     print(f"=== SiteIntel GeoJSON Export ===")
     print(f"Layer: {args.layer}")
     print(f"Jurisdiction: {args.jurisdiction or 'all'}")
     print(f"Output: {args.output_dir}")
+    print(f"Mode: {'pipelined' if args.pipeline else 'sequential'}")
     print()
     
     if args.layer == "all":
-        results = export_all_layers(args.jurisdiction, args.output_dir)
+        results = export_all_layers(args.jurisdiction, args.output_dir, **export_options)
     else:
         conn = get_db_connection()
         try:
-            result = export_layer_to_geojson(conn, args.layer, args.jurisdiction, args.output_dir)
+            result = export_layer_to_geojson(
+                conn, args.layer, args.jurisdiction, args.output_dir, **export_options
+            )
             results = [result]
         finally:
             conn.close()
@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""
+Bulk-seed parcel elevations from Terrarium terrain tiles.
+
+Selects every canonical parcel with a centroid but no `elevation_ft`, groups
+the centroids by zoom-14 terrain tile, fetches and decodes each tile exactly
+once (through an on-disk LRU cache), samples all parcels in a tile in one
+vectorized step, and writes the results back with a single COPY into a temp
+table followed by one UPDATE.
+
+Replaces the batch-of-200 polling loop against the `seed-elevation-data`
+edge function.
+
+Usage:
+    python seed_elevation.py
+    python seed_elevation.py --jurisdiction harris --workers 32
+    python seed_elevation.py --tile-source /data/terrarium --cache-dir .tile-cache
+"""
+
+import argparse
+import io
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import psycopg2
+import requests
+from PIL import Image
+
+# AWS Terrain Tiles (Terrarium encoding, free, no API key needed)
+DEFAULT_TILE_SOURCE = os.environ.get(
+    "TERRAIN_TILE_SOURCE", "https://s3.amazonaws.com/elevation-tiles-prod/terrarium"
+)
+ZOOM_LEVEL = 14  # ~10m resolution at equator, matches the edge function
+TILE_SIZE = 256
+METERS_TO_FEET = 3.28084
+ELEVATION_SOURCE = "aws_terrain"
+
+TileKey = Tuple[int, int, int]
+
+
+def get_db_connection() -> psycopg2.extensions.connection:
+    """Create a connection to Supabase PostgreSQL database."""
+    db_url = os.environ.get("SUPABASE_DB_URL")
+    if not db_url:
+        raise ValueError("SUPABASE_DB_URL environment variable is required")
+
+    return psycopg2.connect(db_url)
+
+
+class TileCache:
+    """
+    On-disk LRU cache of raw terrain tile bytes.
+
+    Recency is tracked by file mtime so the ordering survives across runs;
+    the least recently used tiles are deleted once `max_tiles` is exceeded.
+    """
+
+    def __init__(self, cache_dir: Path, max_tiles: int = 20000):
+        self.cache_dir = cache_dir
+        self.max_tiles = max_tiles
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[TileKey, Path]" = OrderedDict()
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        existing = []
+        for path in self.cache_dir.glob("*_*_*.png"):
+            try:
+                z, x, y = (int(part) for part in path.stem.split("_"))
+            except ValueError:
+                continue
+            existing.append((path.stat().st_mtime, (z, x, y), path))
+        for _, key, path in sorted(existing):
+            self._entries[key] = path
+
+    def _path_for(self, key: TileKey) -> Path:
+        z, x, y = key
+        return self.cache_dir / f"{z}_{x}_{y}.png"
+
+    def get(self, key: TileKey) -> Optional[bytes]:
+        """Return cached tile bytes and mark the tile as recently used."""
+        with self._lock:
+            path = self._entries.get(key)
+            if path is None:
+                return None
+            self._entries.move_to_end(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+            return data
+        except FileNotFoundError:
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+
+    def put(self, key: TileKey, data: bytes) -> None:
+        """Store tile bytes, evicting the least recently used tiles if needed."""
+        path = self._path_for(key)
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+        evicted = []
+        with self._lock:
+            self._entries[key] = path
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_tiles:
+                _, old_path = self._entries.popitem(last=False)
+                evicted.append(old_path)
+
+        for old_path in evicted:
+            try:
+                old_path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class TileSource:
+    """
+    Fetch Terrarium tiles from an HTTP(S) base URL or a local directory.
+
+    Both layouts are `{source}/{z}/{x}/{y}.png`. Returns None for tiles that
+    do not exist so callers can count the affected parcels as errors.
+    """
+
+    def __init__(self, source: str, cache: Optional[TileCache] = None, timeout: int = 30):
+        self.source = source.rstrip("/")
+        self.is_remote = self.source.startswith(("http://", "https://"))
+        self.cache = cache
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            self._local.session = session
+        return session
+
+    def _fetch_uncached(self, key: TileKey) -> Optional[bytes]:
+        z, x, y = key
+        if self.is_remote:
+            response = self._session().get(f"{self.source}/{z}/{x}/{y}.png", timeout=self.timeout)
+            if response.status_code == 404:
+                return None
+            response.raise_for_status()
+            return response.content
+
+        path = Path(self.source) / str(z) / str(x) / f"{y}.png"
+        if not path.exists():
+            return None
+        return path.read_bytes()
+
+    def fetch(self, key: TileKey) -> Optional[bytes]:
+        """Return raw PNG bytes for a tile, consulting the cache for remote sources."""
+        if self.cache is None or not self.is_remote:
+            return self._fetch_uncached(key)
+
+        data = self.cache.get(key)
+        if data is None:
+            data = self._fetch_uncached(key)
+            if data is not None:
+                self.cache.put(key, data)
+        return data
+
+
+def decode_terrarium(png_bytes: bytes) -> np.ndarray:
+    """
+    Decode a Terrarium PNG into a (256, 256) array of elevations in meters.
+
+    Formula: elevation_m = (R * 256 + G + B / 256) - 32768
+    """
+    with Image.open(io.BytesIO(png_bytes)) as img:
+        rgb = np.asarray(img.convert("RGB"), dtype=np.float64)
+    return rgb[..., 0] * 256.0 + rgb[..., 1] + rgb[..., 2] / 256.0 - 32768.0
+
+
+def lnglat_to_tile_pixels(
+    lng: np.ndarray, lat: np.ndarray, zoom: int = ZOOM_LEVEL
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Vectorized Web Mercator lng/lat -> (tile_x, tile_y, pixel_x, pixel_y)."""
+    n = 2 ** zoom
+    lat_rad = np.radians(lat)
+    fx = (lng + 180.0) / 360.0 * n
+    fy = (1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / np.pi) / 2.0 * n
+
+    tile_x = np.clip(np.floor(fx), 0, n - 1).astype(np.int64)
+    tile_y = np.clip(np.floor(fy), 0, n - 1).astype(np.int64)
+    pixel_x = np.clip(np.floor((fx - tile_x) * TILE_SIZE), 0, TILE_SIZE - 1).astype(np.int64)
+    pixel_y = np.clip(np.floor((fy - tile_y) * TILE_SIZE), 0, TILE_SIZE - 1).astype(np.int64)
+    return tile_x, tile_y, pixel_x, pixel_y
+
+
+def fetch_missing_parcels(
+    conn: psycopg2.extensions.connection,
+    jurisdiction: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Load ids and centroid coordinates for parcels without elevation."""
+    query = """
+        SELECT id, ST_X(centroid), ST_Y(centroid)
+        FROM canonical_parcels
+        WHERE elevation_ft IS NULL
+        AND centroid IS NOT NULL
+    """
+    params: list = []
+    if jurisdiction:
+        query += " AND LOWER(jurisdiction) = LOWER(%s)"
+        params.append(jurisdiction)
+    if limit:
+        query += " LIMIT %s"
+        params.append(limit)
+
+    with conn.cursor() as cur:
+        cur.execute(query, params or None)
+        rows = cur.fetchall()
+
+    if not rows:
+        empty = np.empty(0)
+        return empty.astype(np.int64), empty, empty
+
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    lng = np.array([row[1] for row in rows], dtype=np.float64)
+    lat = np.array([row[2] for row in rows], dtype=np.float64)
+    return ids, lng, lat
+
+
+def sample_elevations(
+    lng: np.ndarray,
+    lat: np.ndarray,
+    tile_source: TileSource,
+    workers: int = 16,
+    zoom: int = ZOOM_LEVEL,
+) -> Tuple[np.ndarray, Dict[str, int]]:
+    """
+    Sample elevation (feet) for every point, fetching each tile only once.
+
+    Returns an array aligned with the inputs (NaN where the tile was missing
+    or failed) and fetch statistics.
+    """
+    elevations_ft = np.full(len(lng), np.nan)
+    stats = {"tiles": 0, "tiles_missing": 0, "tiles_failed": 0}
+    if len(lng) == 0:
+        return elevations_ft, stats
+
+    tile_x, tile_y, pixel_x, pixel_y = lnglat_to_tile_pixels(lng, lat, zoom)
+
+    # Group points by tile: sort once, then split into contiguous runs
+    tile_ids = tile_x * (2 ** zoom) + tile_y
+    order = np.argsort(tile_ids, kind="stable")
+    unique_tiles, starts = np.unique(tile_ids[order], return_index=True)
+    groups = np.split(order, starts[1:])
+    stats["tiles"] = len(unique_tiles)
+
+    def load(tile_id: int) -> Optional[np.ndarray]:
+        key = (zoom, int(tile_id) // (2 ** zoom), int(tile_id) % (2 ** zoom))
+        data = tile_source.fetch(key)
+        return decode_terrarium(data) if data is not None else None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(load, tile_id): idx
+            for idx, tile_id in enumerate(unique_tiles)
+        }
+        for future in as_completed(futures):
+            idx = futures[future]
+            try:
+                grid = future.result()
+            except Exception as e:
+                print(f"  ✗ Tile {zoom}/{unique_tiles[idx]} failed: {e}")
+                stats["tiles_failed"] += 1
+                continue
+            if grid is None:
+                stats["tiles_missing"] += 1
+                continue
+
+            points = groups[idx]
+            elevations_ft[points] = grid[pixel_y[points], pixel_x[points]] * METERS_TO_FEET
+
+    return np.round(elevations_ft, 2), stats
+
+
+def write_elevations(
+    conn: psycopg2.extensions.connection,
+    ids: np.ndarray,
+    elevations_ft: np.ndarray,
+) -> int:
+    """Write elevations back with one COPY into a temp table and one UPDATE."""
+    valid = ~np.isnan(elevations_ft)
+    if not valid.any():
+        return 0
+
+    buffer = io.StringIO()
+    for parcel_id, elevation in zip(ids[valid], elevations_ft[valid]):
+        buffer.write(f"{parcel_id}\t{elevation:.2f}\n")
+    buffer.seek(0)
+
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TEMP TABLE tmp_parcel_elevation (
+                id BIGINT PRIMARY KEY,
+                elevation_ft NUMERIC(10,2)
+            ) ON COMMIT DROP
+        """)
+        cur.copy_expert(
+            "COPY tmp_parcel_elevation (id, elevation_ft) FROM STDIN", buffer
+        )
+        cur.execute("""
+            UPDATE canonical_parcels AS p
+            SET elevation_ft = t.elevation_ft,
+                elevation_source = %s,
+                elevation_sampled_at = NOW()
+            FROM tmp_parcel_elevation AS t
+            WHERE p.id = t.id
+        """, (ELEVATION_SOURCE,))
+        updated = cur.rowcount
+    conn.commit()
+    return updated
+
+
+def seed_elevation(
+    conn: psycopg2.extensions.connection,
+    tile_source: TileSource,
+    jurisdiction: Optional[str] = None,
+    workers: int = 16,
+    limit: Optional[int] = None,
+    dry_run: bool = False,
+) -> Dict[str, Any]:
+    """
+    Seed `elevation_ft` for all parcels missing it.
+
+    Args:
+        conn: Database connection
+        tile_source: Where to read Terrarium tiles from
+        jurisdiction: Optional jurisdiction filter (e.g., 'harris', 'travis')
+        workers: Number of concurrent tile fetches
+        limit: Optional cap on parcels processed in this run
+        dry_run: Sample elevations but skip the database write
+
+    Returns:
+        Dictionary with seeding statistics
+    """
+    started = time.monotonic()
+
+    ids, lng, lat = fetch_missing_parcels(conn, jurisdiction, limit)
+    print(f"Found {len(ids):,} parcels missing elevation")
+
+    elevations_ft, stats = sample_elevations(lng, lat, tile_source, workers)
+    sampled = int((~np.isnan(elevations_ft)).sum())
+    print(
+        f"  Sampled {sampled:,} parcels from {stats['tiles']:,} tiles "
+        f"({stats['tiles_missing']} missing, {stats['tiles_failed']} failed)"
+    )
+
+    updated = 0 if dry_run else write_elevations(conn, ids, elevations_ft)
+    if not dry_run:
+        print(f"  ✓ Updated {updated:,} parcels")
+
+    return {
+        "jurisdiction": jurisdiction,
+        "candidates": len(ids),
+        "sampled": sampled,
+        "updated": updated,
+        "errors": len(ids) - sampled,
+        "duration_ms": int((time.monotonic() - started) * 1000),
+        **stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Seed canonical_parcels.elevation_ft from terrain tiles"
+    )
+    parser.add_argument(
+        "--jurisdiction",
+        help="Filter by jurisdiction (e.g., 'harris', 'travis')",
+    )
+    parser.add_argument(
+        "--tile-source",
+        default=DEFAULT_TILE_SOURCE,
+        help="Terrarium tile base URL or local directory ({z}/{x}/{y}.png layout)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=Path(".tile-cache/terrarium"),
+        help="Directory for the on-disk tile cache",
+    )
+    parser.add_argument(
+        "--cache-max-tiles",
+        type=int,
+        default=20000,
+        help="Maximum number of tiles kept in the cache before LRU eviction",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=16,
+        help="Number of concurrent tile fetches",
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        help="Maximum number of parcels to process in this run",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Sample elevations without writing to the database",
+    )
+
+    args = parser.parse_args()
+
+    print(f"=== SiteIntel Elevation Seeding ===")
+    print(f"Jurisdiction: {args.jurisdiction or 'all'}")
+    print(f"Tile source: {args.tile_source}")
+    print(f"Workers: {args.workers}")
+    print()
+
+    cache = TileCache(args.cache_dir, args.cache_max_tiles)
+    tile_source = TileSource(args.tile_source, cache)
+
+    conn = get_db_connection()
+    try:
+        result = seed_elevation(
+            conn,
+            tile_source,
+            jurisdiction=args.jurisdiction,
+            workers=args.workers,
+            limit=args.limit,
+            dry_run=args.dry_run,
+        )
+    finally:
+        conn.close()
+
+    print()
+    print("=== Elevation Summary ===")
+    print(f"  Candidates: {result['candidates']:,}")
+    print(f"  Updated: {result['updated']:,}")
+    print(f"  Errors: {result['errors']:,}")
+    print(f"  Duration: {result['duration_ms'] / 1000:.1f}s")
+
+    return 0 if result["sampled"] > 0 or result["candidates"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())